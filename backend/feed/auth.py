@@ -1,6 +1,9 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework.authentication import BaseAuthentication
 
+from .caching import HEADER_USER_CACHE_KEY, HEADER_USER_CACHE_TTL
+
 
 class HeaderUserAuthentication(BaseAuthentication):
     def authenticate(self, request):
@@ -9,5 +12,13 @@ class HeaderUserAuthentication(BaseAuthentication):
             return None
 
         User = get_user_model()
+        cache_key = HEADER_USER_CACHE_KEY.format(username)
+        user_id = cache.get(cache_key)
+        if user_id is not None:
+            # Only id and username are known; any other field is loaded lazily on access.
+            user = User.from_db(User.objects.db, [User._meta.pk.attname, 'username'], [user_id, username])
+            return (user, None)
+
         user, _ = User.objects.get_or_create(username=username)
+        cache.set(cache_key, user.pk, HEADER_USER_CACHE_TTL)
         return (user, None)
@@ -0,0 +1,24 @@
+from django.core.cache import cache
+from django.db import transaction
+
+
+LEADERBOARD_CACHE_KEY = 'leaderboard:top5'
+LEADERBOARD_CACHE_TTL = 60
+
+HEADER_USER_CACHE_KEY = 'hdruser:{}'
+HEADER_USER_CACHE_TTL = 60 * 60
+
+POST_COUNT_CACHE_KEY = 'feed:post_count'
+POST_COUNT_CACHE_TTL = 60
+
+
+def invalidate_leaderboard():
+    # Drop the cached top 5 once the event is visible to other connections,
+    # otherwise a concurrent read could re-cache the pre-commit totals.
+    transaction.on_commit(lambda: cache.delete(LEADERBOARD_CACHE_KEY))
+
+
+def invalidate_header_user(username):
+    # Same on-commit rule: a cached id must never outlive the user row it points at.
+    cache_key = HEADER_USER_CACHE_KEY.format(username)
+    transaction.on_commit(lambda: cache.delete(cache_key))
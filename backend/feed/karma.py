@@ -0,0 +1,46 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .caching import invalidate_leaderboard
+from .models import KarmaEvent, KarmaHourly
+
+
+def hour_bucket(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _add_to_bucket(user_id, bucket, delta):
+    return KarmaHourly.objects.filter(user_id=user_id, hour_bucket=bucket).update(
+        delta_sum=F('delta_sum') + delta
+    )
+
+
+def add_to_hourly_rollup(events):
+    totals = Counter()
+    for e in events:
+        totals[(e.user_id, hour_bucket(e.created_at))] += e.delta
+
+    for (user_id, bucket), delta in totals.items():
+        if _add_to_bucket(user_id, bucket, delta):
+            continue
+        try:
+            with transaction.atomic():
+                KarmaHourly.objects.create(user_id=user_id, hour_bucket=bucket, delta_sum=delta)
+        except IntegrityError:
+            # Another request created the bucket between our UPDATE and INSERT.
+            _add_to_bucket(user_id, bucket, delta)
+
+
+def remove_from_hourly_rollup(event):
+    # The bucket may already be gone when the user itself is being deleted.
+    _add_to_bucket(event.user_id, hour_bucket(event.created_at), -event.delta)
+
+
+def record_karma(events):
+    # One multi-row INSERT for everything a request emits, instead of one per event.
+    if events:
+        KarmaEvent.objects.bulk_create(events)
+        add_to_hourly_rollup(events)
+        invalidate_leaderboard()
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-15 09:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Post = apps.get_model('feed', 'Post')
+    PostLike = apps.get_model('feed', 'PostLike')
+    Comment = apps.get_model('feed', 'Comment')
+
+    def count_of(model):
+        qs = (
+            model.objects.filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(c=Count('*'))
+            .values('c')
+        )
+        return Coalesce(Subquery(qs, output_field=models.IntegerField()), 0)
+
+    Post.objects.update(like_count=count_of(PostLike), comment_count=count_of(Comment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-15 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('feed', '0002_post_like_count_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commentlike',
+            index=models.Index(fields=['user', 'comment'], name='cl_user_comment_ix'),
+        ),
+        migrations.AddIndex(
+            model_name='postlike',
+            index=models.Index(fields=['user', 'post'], name='pl_user_post_ix'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-15 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('feed', '0003_postlike_commentlike_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='karmaevent',
+            index=models.Index(fields=['created_at', 'user', 'delta'], name='ke_leaderboard_ix'),
+        ),
+        migrations.RemoveIndex(
+            model_name='karmaevent',
+            name='feed_karmae_created_dcb283_idx',
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.1 on 2026-10-15 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncHour
+
+
+def backfill_rollup(apps, schema_editor):
+    KarmaEvent = apps.get_model('feed', 'KarmaEvent')
+    KarmaHourly = apps.get_model('feed', 'KarmaHourly')
+
+    rows = (
+        KarmaEvent.objects.annotate(hour_bucket=TruncHour('created_at'))
+        .values('user', 'hour_bucket')
+        .annotate(delta_sum=Sum('delta'))
+        .order_by()
+    )
+    KarmaHourly.objects.bulk_create(
+        KarmaHourly(user_id=r['user'], hour_bucket=r['hour_bucket'], delta_sum=r['delta_sum'])
+        for r in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('feed', '0004_karmaevent_leaderboard_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KarmaHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour_bucket', models.DateTimeField()),
+                ('delta_sum', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='karma_hourly', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='karmahourly',
+            constraint=models.UniqueConstraint(fields=('user', 'hour_bucket'), name='uniq_karma_hourly'),
+        ),
+        migrations.AddIndex(
+            model_name='karmahourly',
+            index=models.Index(fields=['hour_bucket', 'user', 'delta_sum'], name='kh_leaderboard_ix'),
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
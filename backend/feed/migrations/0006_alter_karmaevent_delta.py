@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-15 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0005_karmahourly'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='karmaevent',
+            name='delta',
+            field=models.SmallIntegerField(),
+        ),
+    ]
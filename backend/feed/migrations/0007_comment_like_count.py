@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-15 12:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_count(apps, schema_editor):
+    Comment = apps.get_model('feed', 'Comment')
+    CommentLike = apps.get_model('feed', 'CommentLike')
+
+    likes = (
+        CommentLike.objects.filter(comment=OuterRef('pk'))
+        .order_by()
+        .values('comment')
+        .annotate(c=Count('*'))
+        .values('c')
+    )
+    Comment.objects.update(like_count=Coalesce(Subquery(likes, output_field=models.IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0006_alter_karmaevent_delta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_like_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-15 15:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0007_comment_like_count'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='karmaevent',
+            name='ke_leaderboard_ix',
+        ),
+    ]
@@ -10,6 +10,8 @@ class Post(models.Model):
     )
     body = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
@@ -31,6 +33,7 @@ class Comment(models.Model):
     )
     body = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    like_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['created_at']
@@ -49,6 +52,9 @@ class PostLike(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['post', 'user'], name='uniq_post_like'),
         ]
+        indexes = [
+            models.Index(fields=['user', 'post'], name='pl_user_post_ix'),
+        ]
 
 
 class CommentLike(models.Model):
@@ -64,6 +70,9 @@ class CommentLike(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['comment', 'user'], name='uniq_comment_like'),
         ]
+        indexes = [
+            models.Index(fields=['user', 'comment'], name='cl_user_comment_ix'),
+        ]
 
 
 class KarmaEvent(models.Model):
@@ -78,7 +87,7 @@ class KarmaEvent(models.Model):
         related_name='karma_actions',
     )
     event_type = models.CharField(max_length=32)
-    delta = models.IntegerField()
+    delta = models.SmallIntegerField()
     post = models.ForeignKey(Post, null=True, blank=True, on_delete=models.CASCADE)
     comment = models.ForeignKey(Comment, null=True, blank=True, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -94,6 +103,23 @@ class KarmaEvent(models.Model):
             ),
         ]
         indexes = [
-            models.Index(fields=['created_at']),
             models.Index(fields=['user', 'created_at']),
         ]
+
+
+class KarmaHourly(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='karma_hourly',
+    )
+    hour_bucket = models.DateTimeField()
+    delta_sum = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'hour_bucket'], name='uniq_karma_hourly'),
+        ]
+        indexes = [
+            models.Index(fields=['hour_bucket', 'user', 'delta_sum'], name='kh_leaderboard_ix'),
+        ]
@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+
+from .caching import POST_COUNT_CACHE_KEY, POST_COUNT_CACHE_TTL
+
+
+class PostCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return cache.get_or_set(POST_COUNT_CACHE_KEY, self.object_list.count, POST_COUNT_CACHE_TTL)
+
+
+class PostPagination(PageNumberPagination):
+    django_paginator_class = PostCountPaginator
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = request.query_params.get(self.page_query_param)
+        # Opt-in: without ?page= the feed keeps returning a plain list.
+        if page is None:
+            return None
+        # Page 1 is where clients (re)start, so refresh the total there.
+        if page == '1':
+            cache.delete(POST_COUNT_CACHE_KEY)
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import invalidate_header_user, invalidate_leaderboard
+from .karma import add_to_hourly_rollup, remove_from_hourly_rollup
+from .models import Comment, CommentLike, KarmaEvent, Post, PostLike
+
+
+# Counter columns are kept here rather than in the views so that cascaded
+# deletes (a user, post or parent comment going away) keep them in step too.
+@receiver(post_save, sender=PostLike)
+def post_like_saved(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(like_count=F('like_count') + 1)
+
+
+@receiver(post_delete, sender=PostLike)
+def post_like_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(like_count=F('like_count') - 1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') - 1)
+
+
+@receiver(post_save, sender=CommentLike)
+def comment_like_saved(sender, instance, created, **kwargs):
+    if created:
+        Comment.objects.filter(pk=instance.comment_id).update(like_count=F('like_count') + 1)
+
+
+@receiver(post_delete, sender=CommentLike)
+def comment_like_deleted(sender, instance, **kwargs):
+    Comment.objects.filter(pk=instance.comment_id).update(like_count=F('like_count') - 1)
+
+
+@receiver(post_save, sender=KarmaEvent)
+def karma_event_saved(sender, instance, created, **kwargs):
+    # bulk_create() skips post_save, so record_karma() handles the rollup on its own;
+    # this covers events saved one at a time (admin, shell).
+    if created:
+        add_to_hourly_rollup([instance])
+    invalidate_leaderboard()
+
+
+@receiver(post_delete, sender=KarmaEvent)
+def karma_event_deleted(sender, instance, **kwargs):
+    # Cascades from a post, comment, actor or user land here one event at a time.
+    remove_from_hourly_rollup(instance)
+    invalidate_leaderboard()
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_previous_username(sender, instance, **kwargs):
+    # A rename must also drop the cache entry for the old name.
+    instance._previous_username = None
+    if instance.pk is not None:
+        instance._previous_username = (
+            sender.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    invalidate_header_user(instance.username)
+    previous = getattr(instance, '_previous_username', None)
+    if previous and previous != instance.username:
+        invalidate_header_user(previous)
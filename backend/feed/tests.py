@@ -1,3 +1,418 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from . import karma
+from .models import Comment, KarmaEvent, KarmaHourly, Post
+from .views import build_comment_tree
+
+
+User = get_user_model()
+
+
+class FeedTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice')
+        self.bob = User.objects.create_user(username='bob')
+        self.post = Post.objects.create(author=self.alice, body='hello')
+        self.client.credentials(HTTP_X_USER='bob')
+
+
+class KarmaRollupTests(FeedTestCase):
+    def _event(self, delta):
+        return KarmaEvent(
+            user=self.alice,
+            actor=self.bob,
+            event_type='post_like',
+            delta=delta,
+            post=self.post,
+        )
+
+    def _delta_sum(self):
+        return KarmaHourly.objects.get(user=self.alice).delta_sum
+
+    def test_record_karma_sums_into_one_bucket(self):
+        karma.record_karma([self._event(5), self._event(-5), self._event(5)])
+
+        self.assertEqual(KarmaHourly.objects.count(), 1)
+        self.assertEqual(self._delta_sum(), 5)
+
+    def test_single_create_is_counted_once(self):
+        karma.record_karma([self._event(5)])
+        KarmaEvent.objects.create(
+            user=self.alice,
+            actor=self.bob,
+            event_type='post_like',
+            delta=5,
+            post=self.post,
+        )
+
+        self.assertEqual(KarmaEvent.objects.count(), 2)
+        self.assertEqual(self._delta_sum(), 10)
+
+    def test_lost_insert_race_falls_back_to_update(self):
+        karma.record_karma([self._event(5)])
+
+        real_add = karma._add_to_bucket
+        calls = []
+
+        def add_after_race(*args):
+            # First UPDATE sees no row, as if a concurrent request created it meanwhile.
+            calls.append(args)
+            return 0 if len(calls) == 1 else real_add(*args)
+
+        with mock.patch.object(karma, '_add_to_bucket', side_effect=add_after_race):
+            karma.record_karma([self._event(1)])
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(KarmaHourly.objects.count(), 1)
+        self.assertEqual(self._delta_sum(), 6)
+
+    def test_cascaded_event_delete_is_subtracted(self):
+        karma.record_karma([self._event(5)])
+        carol = User.objects.create_user(username='carol')
+        karma.record_karma(
+            [KarmaEvent(user=self.alice, actor=carol, event_type='post_like', delta=5, post=self.post)]
+        )
+
+        self.bob.delete()
+
+        self.assertEqual(self._delta_sum(), 5)
+
+
+class LeaderboardTests(FeedTestCase):
+    def test_like_invalidates_cached_leaderboard(self):
+        url = reverse('leaderboard')
+        self.assertEqual(self.client.get(url).data, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('post-like', args=[self.post.id]))
+
+        self.assertEqual(
+            self.client.get(url).data,
+            [{'user': {'id': self.alice.id, 'username': 'alice'}, 'karma': 5}],
+        )
+
+    def test_window_includes_bucket_containing_cutoff(self):
+        now = timezone.now()
+        KarmaHourly.objects.create(
+            user=self.alice,
+            hour_bucket=karma.hour_bucket(now - timedelta(hours=23, minutes=59)),
+            delta_sum=5,
+        )
+        KarmaHourly.objects.create(
+            user=self.bob,
+            hour_bucket=karma.hour_bucket(now - timedelta(hours=25)),
+            delta_sum=1,
+        )
+
+        self.assertEqual(
+            self.client.get(reverse('leaderboard')).data,
+            [{'user': {'id': self.alice.id, 'username': 'alice'}, 'karma': 5}],
+        )
+
+    def test_deleted_actor_karma_leaves_leaderboard(self):
+        url = reverse('leaderboard')
+        self.client.post(reverse('post-like', args=[self.post.id]))
+        self.assertEqual(self.client.get(url).data[0]['karma'], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.delete()
+
+        self.assertFalse(any(row['karma'] for row in self.client.get(url).data))
+
+
+class CommentTreeTests(FeedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = Comment.objects.create(post=self.post, author=self.alice, body='root')
+        self.reply = Comment.objects.create(post=self.post, author=self.bob, body='reply', parent=self.root)
+        self.nested = Comment.objects.create(post=self.post, author=self.alice, body='nested', parent=self.reply)
+        self.second = Comment.objects.create(post=self.post, author=self.alice, body='second', parent=self.root)
+        self.other_root = Comment.objects.create(post=self.post, author=self.bob, body='other root')
+
+    def _tree(self):
+        res = self.client.get(reverse('post-detail', args=[self.post.id]))
+        self.assertEqual(res.status_code, 200)
+
+        def shape(nodes):
+            return [(n['body'], shape(n['children'])) for n in nodes]
+
+        return shape(res.data['comments'])
+
+    def test_tree_shape(self):
+        self.assertEqual(
+            self._tree(),
+            [
+                ('root', [('reply', [('nested', [])]), ('second', [])]),
+                ('other root', []),
+            ],
+        )
+
+    def test_reply_timestamped_before_parent(self):
+        Comment.objects.filter(pk=self.nested.pk).update(
+            created_at=self.reply.created_at - timedelta(seconds=1)
+        )
+
+        self.assertEqual(
+            self._tree(),
+            [
+                ('root', [('reply', [('nested', [])]), ('second', [])]),
+                ('other root', []),
+            ],
+        )
+
+
+class PostLikeTests(FeedTestCase):
+    def test_like_is_idempotent(self):
+        url = reverse('post-like', args=[self.post.id])
+
+        for _ in range(2):
+            res = self.client.post(url)
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.data, {'liked': True, 'like_count': 1})
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(KarmaEvent.objects.filter(event_type='post_like').count(), 1)
+
+    def test_unlike_is_idempotent(self):
+        url = reverse('post-like', args=[self.post.id])
+        self.client.post(url)
+
+        for _ in range(2):
+            res = self.client.delete(url)
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.data, {'liked': False, 'like_count': 0})
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        self.assertEqual(KarmaEvent.objects.filter(event_type='post_unlike').count(), 1)
+
+    def test_like_missing_post_is_404(self):
+        res = self.client.post(reverse('post-like', args=[self.post.id + 1]))
+        self.assertEqual(res.status_code, 404)
+
+
+class CreateCommentTests(FeedTestCase):
+    def test_comment_count_is_bumped(self):
+        url = reverse('comment-create', args=[self.post.id])
+        res = self.client.post(url, {'body': 'first'}, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.client.post(url, {'body': 'reply', 'parent_id': res.data['id']}, format='json')
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+
+class PostCounterCascadeTests(FeedTestCase):
+    def test_deleting_user_updates_post_counters(self):
+        self.client.post(reverse('post-like', args=[self.post.id]))
+        self.client.post(reverse('comment-create', args=[self.post.id]), {'body': 'hi'}, format='json')
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 1))
+
+        self.bob.delete()
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (0, 0))
+
+    def test_deleting_comment_counts_its_replies(self):
+        root = Comment.objects.create(post=self.post, author=self.alice, body='root')
+        Comment.objects.create(post=self.post, author=self.bob, body='reply', parent=root)
+
+        root.delete()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+
+class CommentLikeTests(FeedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.comment = Comment.objects.create(post=self.post, author=self.alice, body='hi')
+
+    def test_like_and_unlike_are_idempotent(self):
+        url = reverse('comment-like', args=[self.comment.id])
+
+        for _ in range(2):
+            res = self.client.post(url)
+            self.assertEqual(res.data, {'liked': True, 'like_count': 1})
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.like_count, 1)
+
+        for _ in range(2):
+            res = self.client.delete(url)
+            self.assertEqual(res.data, {'liked': False, 'like_count': 0})
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.like_count, 0)
+
+        self.assertEqual(
+            list(KarmaEvent.objects.order_by('id').values_list('event_type', 'delta')),
+            [('comment_like', 1), ('comment_unlike', -1)],
+        )
+
+    def test_deleting_user_updates_comment_counter(self):
+        self.client.post(reverse('comment-like', args=[self.comment.id]))
+
+        self.bob.delete()
+
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.like_count, 0)
+
+
+class HeaderUserAuthenticationTests(FeedTestCase):
+    def test_deleted_user_is_recreated(self):
+        self.client.get(reverse('post-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.delete()
+
+        res = self.client.post(reverse('post-list'), {'body': 'back again'}, format='json')
+
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(User.objects.filter(username='bob').exists())
+
+    def test_renamed_user_old_name_is_not_reused(self):
+        self.client.get(reverse('post-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.username = 'robert'
+            self.bob.save()
+
+        res = self.client.post(reverse('post-list'), {'body': 'who am i'}, format='json')
+
+        self.assertEqual(res.status_code, 201)
+        new_bob = User.objects.get(username='bob')
+        self.assertNotEqual(new_bob.pk, self.bob.pk)
+        self.assertEqual(Post.objects.get(pk=res.data['id']).author, new_bob)
+
+
+class PostPaginationTests(FeedTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(2):
+            Post.objects.create(author=self.bob, body=f'post {i}')
+
+    def test_plain_list_without_page(self):
+        res = self.client.get(reverse('post-list'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIsInstance(res.data, list)
+        self.assertEqual(len(res.data), 3)
+
+    def test_page_envelope(self):
+        res = self.client.get(reverse('post-list'), {'page': 1, 'page_size': 2})
+
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+        self.assertIsNone(res.data['previous'])
+
+    def test_total_is_cached_until_page_one(self):
+        url = reverse('post-list')
+        self.client.get(url, {'page': 1, 'page_size': 2})
+        Post.objects.create(author=self.bob, body='late')
+
+        self.assertEqual(self.client.get(url, {'page': 2, 'page_size': 2}).data['count'], 3)
+        self.assertEqual(self.client.get(url, {'page': 1, 'page_size': 2}).data['count'], 4)
+
+
+class AnonymousLikedByMeTests(FeedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.comment = Comment.objects.create(post=self.post, author=self.alice, body='hi')
+        self.client.post(reverse('post-like', args=[self.post.id]))
+        self.client.post(reverse('comment-like', args=[self.comment.id]))
+        self.client.credentials()
+
+    def test_comment_tree_skips_like_lookup(self):
+        with self.assertNumQueries(1):
+            tree = build_comment_tree(self.post, AnonymousUser())
+
+        self.assertEqual([node['liked_by_me'] for node in tree], [False])
+
+    def test_anonymous_detail_is_never_liked(self):
+        res = self.client.get(reverse('post-detail', args=[self.post.id]))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.data['liked_by_me'])
+        self.assertFalse(res.data['comments'][0]['liked_by_me'])
+        self.assertEqual(res.data['like_count'], 1)
+
+
+class PostPreviewTests(FeedTestCase):
+    def _row(self):
+        rows = self.client.get(reverse('post-list')).data
+        return next(row for row in rows if row['id'] == self.post.id)
+
+    def test_long_body_is_truncated(self):
+        Post.objects.filter(pk=self.post.pk).update(body='x' * 300)
+
+        row = self._row()
+
+        self.assertEqual(row['body_preview'], 'x' * 280)
+        self.assertTrue(row['body_truncated'])
+        self.assertNotIn('body', row)
+
+    def test_short_body_is_whole(self):
+        row = self._row()
+
+        self.assertEqual(row['body_preview'], 'hello')
+        self.assertFalse(row['body_truncated'])
+        self.assertEqual(self.client.get(reverse('post-detail', args=[self.post.id])).data['body'], 'hello')
+
+
+class PostListTests(FeedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.own = Post.objects.create(author=self.bob, body='mine')
+
+    def test_row_shape(self):
+        rows = self.client.get(reverse('post-list')).data
+        row = next(row for row in rows if row['id'] == self.own.id)
+
+        self.assertEqual(
+            set(row),
+            {
+                'id',
+                'body_preview',
+                'body_truncated',
+                'author',
+                'created_at',
+                'like_count',
+                'comment_count',
+                'liked_by_me',
+            },
+        )
+        self.assertEqual(row['author'], {'id': self.bob.id, 'username': 'bob'})
+
+    def test_liked_by_me_plain_and_paged(self):
+        self.client.post(reverse('post-like', args=[self.post.id]))
+        url = reverse('post-list')
+
+        for rows in (self.client.get(url).data, self.client.get(url, {'page': 1}).data['results']):
+            liked = {row['id']: (row['liked_by_me'], row['like_count']) for row in rows}
+            self.assertEqual(liked, {self.post.id: (True, 1), self.own.id: (False, 0)})
+
+
+class ApiRootTests(FeedTestCase):
+    def test_links_follow_scheme_and_host(self):
+        url = reverse('api-root')
+
+        self.assertEqual(
+            self.client.get(url).data,
+            {
+                'posts': 'http://testserver/api/posts/',
+                'leaderboard': 'http://testserver/api/leaderboard/',
+            },
+        )
+        self.assertEqual(
+            self.client.get(url, secure=True, HTTP_HOST='feed.example').data['posts'],
+            'https://feed.example/api/posts/',
+        )
@@ -1,120 +1,184 @@
 from datetime import timedelta
+from functools import lru_cache
 
-from django.contrib.auth import get_user_model
-from django.db import IntegrityError, transaction
-from django.db.models import Count, Exists, OuterRef, Sum
-from django.db.models.functions import Coalesce
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Sum, Value
+from django.db.models.functions import Coalesce, Length, Substr
+from django.db.models.lookups import GreaterThan
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
-from .models import Comment, CommentLike, KarmaEvent, Post, PostLike
-from .serializers import (
-    CommentCreateSerializer,
-    PostCreateSerializer,
-    PostDetailSerializer,
-    PostListSerializer,
-)
+from .caching import LEADERBOARD_CACHE_KEY, LEADERBOARD_CACHE_TTL
+from .karma import hour_bucket, record_karma
+from .models import Comment, CommentLike, KarmaEvent, KarmaHourly, Post, PostLike
+from .pagination import PostPagination
+from .serializers import CommentCreateSerializer, PostCreateSerializer
 
 
+BODY_PREVIEW_LENGTH = 280
+
+
+@lru_cache(maxsize=32)
+def _api_root_links(scheme, host):
+    # ALLOWED_HOSTS is open, so the Host header is client-controlled; keep the memo bounded.
+    return {
+        'posts': f'{scheme}://{host}{reverse("post-list")}',
+        'leaderboard': f'{scheme}://{host}{reverse("leaderboard")}',
+    }
+
+
+@transaction.non_atomic_requests
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def api_root(request):
-    return Response(
-        {
-            'posts': request.build_absolute_uri('posts/'),
-            'leaderboard': request.build_absolute_uri('leaderboard/'),
-        }
-    )
+    # The links only depend on scheme and host, so they are memoized in process
+    # instead of costing a cache round trip. Only the link dict is kept; the
+    # rendered response can carry per-user content and must not be shared.
+    return Response(_api_root_links(request.scheme, request.get_host()))
+
+
+def _comment_to_dict(row, liked_by_me, children):
+    return {
+        'id': row['id'],
+        'body': row['body'],
+        'author': {
+            'id': row['author_id'],
+            'username': row['author__username'],
+        },
+        'created_at': row['created_at'],
+        'like_count': row['like_count'],
+        'liked_by_me': liked_by_me,
+        'children': children,
+    }
 
 
-def _comment_to_dict(c, by_parent):
+def _post_row_to_dict(row, liked_by_me):
     return {
-        'id': c.id,
-        'body': c.body,
+        'id': row['id'],
+        'body_preview': row['body_preview'],
+        'body_truncated': row['body_truncated'],
         'author': {
-            'id': c.author_id,
-            'username': c.author.username,
+            'id': row['author_id'],
+            'username': row['author__username'],
         },
-        'created_at': c.created_at,
-        'like_count': getattr(c, 'like_count', 0),
-        'liked_by_me': getattr(c, 'liked_by_me', False),
-        'children': [
-            _comment_to_dict(child, by_parent)
-            for child in by_parent.get(c.id, [])
-        ],
+        'created_at': row['created_at'],
+        'like_count': row['like_count'],
+        'comment_count': row['comment_count'],
+        'liked_by_me': liked_by_me,
     }
 
 
+def _liked_by_me(user):
+    # Anonymous users can't have likes, so don't make every row pay for the subquery.
+    if not user.is_authenticated:
+        return Value(False, output_field=BooleanField())
+    return Exists(PostLike.objects.filter(post=OuterRef('pk'), user=user))
+
+
 def build_comment_tree(post, user):
-    liked_by_me_sq = CommentLike.objects.filter(comment=OuterRef('pk'), user=user)
-    comments = (
+    # Plain rows are enough to build the tree; no need to materialize
+    # Comment/User objects. (created_at, id) is the display order for siblings.
+    comments = list(
         Comment.objects.filter(post=post)
-        .select_related('author')
-        .annotate(like_count=Count('likes', distinct=True))
-        .annotate(liked_by_me=Exists(liked_by_me_sq))
-        .order_by('created_at')
+        .order_by('created_at', 'id')
+        .values('id', 'parent_id', 'body', 'created_at', 'like_count', 'author_id', 'author__username')
     )
+    liked = set()
+    if user.is_authenticated:
+        liked = set(
+            CommentLike.objects.filter(comment__post=post, user=user).values_list('comment_id', flat=True)
+        )
 
     by_parent = {}
     roots = []
 
-    for c in comments:
-        if c.parent_id is None:
-            roots.append(c)
+    for row in comments:
+        if row['parent_id'] is None:
+            roots.append(row['id'])
         else:
-            by_parent.setdefault(c.parent_id, []).append(c)
+            by_parent.setdefault(row['parent_id'], []).append(row['id'])
+
+    # A parent's id is always allocated before its replies' (timestamps can
+    # skew, ids can't), so walking by descending id builds every child first.
+    node_dicts = {}
+    for row in sorted(comments, key=lambda r: r['id'], reverse=True):
+        comment_id = row['id']
+        node_dicts[comment_id] = _comment_to_dict(
+            row,
+            comment_id in liked,
+            [node_dicts[child_id] for child_id in by_parent.get(comment_id, ())],
+        )
 
-    return [_comment_to_dict(c, by_parent) for c in roots]
+    return [node_dicts[comment_id] for comment_id in roots]
 
 
+# Reads never need ATOMIC_REQUESTS' BEGIN/COMMIT; writes here open their own transaction.
+@method_decorator(transaction.non_atomic_requests, name='dispatch')
 class PostListCreateView(generics.ListCreateAPIView):
+    serializer_class = PostCreateSerializer
+    pagination_class = PostPagination
+
     def get_queryset(self):
-        liked_by_me_sq = PostLike.objects.filter(post=OuterRef('pk'), user=self.request.user)
-        return (
-            Post.objects.all()
-            .select_related('author')
-            .annotate(
-                like_count=Count('likes', distinct=True),
-                comment_count=Count('comments', distinct=True),
-            )
-            .annotate(liked_by_me=Exists(liked_by_me_sq))
+        # The feed only shows a preview, so leave the full body in the database.
+        return Post.objects.values(
+            'id', 'author_id', 'author__username', 'created_at', 'like_count', 'comment_count'
+        ).annotate(
+            body_preview=Substr('body', 1, BODY_PREVIEW_LENGTH),
+            body_truncated=GreaterThan(Length('body'), BODY_PREVIEW_LENGTH),
         )
 
-    def get_serializer_class(self):
-        if self.request.method == 'POST':
-            return PostCreateSerializer
-        return PostListSerializer
+    def list(self, request, *args, **kwargs):
+        # The feed is the hottest endpoint, so build plain dicts from value rows
+        # instead of running each post through serializer fields.
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+
+        liked = set()
+        if request.user.is_authenticated:
+            likes = PostLike.objects.filter(user=request.user)
+            if page is not None:
+                likes = likes.filter(post_id__in=[row['id'] for row in rows])
+            liked = set(likes.values_list('post_id', flat=True))
+
+        data = [_post_row_to_dict(row, row['id'] in liked) for row in rows]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
 
+@method_decorator(transaction.non_atomic_requests, name='dispatch')
 class PostDetailView(generics.RetrieveAPIView):
-    serializer_class = PostDetailSerializer
-
     def get_queryset(self):
-        liked_by_me_sq = PostLike.objects.filter(post=OuterRef('pk'), user=self.request.user)
         return (
             Post.objects.all()
             .select_related('author')
-            .annotate(like_count=Count('likes', distinct=True))
-            .annotate(liked_by_me=Exists(liked_by_me_sq))
+            .annotate(liked_by_me=_liked_by_me(self.request.user))
         )
 
     def retrieve(self, request, *args, **kwargs):
         post = self.get_object()
-        serializer = self.get_serializer(
-            post,
-            context={
-                **self.get_serializer_context(),
+        return Response(
+            {
+                'id': post.id,
+                'body': post.body,
+                'author': {'id': post.author_id, 'username': post.author.username},
+                'created_at': post.created_at,
+                'like_count': post.like_count,
+                'liked_by_me': post.liked_by_me,
                 'comments': build_comment_tree(post, request.user),
-            },
+            }
         )
-        return Response(serializer.data)
 
 
 @api_view(['POST'])
@@ -128,12 +192,13 @@ def create_comment(request, post_id):
     if parent_id is not None:
         parent = get_object_or_404(Comment, id=parent_id, post=post)
 
-    comment = Comment.objects.create(
-        post=post,
-        author=request.user,
-        parent=parent,
-        body=serializer.validated_data['body'],
-    )
+    with transaction.atomic():
+        comment = Comment.objects.create(
+            post=post,
+            author=request.user,
+            parent=parent,
+            body=serializer.validated_data['body'],
+        )
 
     return Response(
         {
@@ -151,96 +216,117 @@ def create_comment(request, post_id):
 
 @api_view(['POST', 'DELETE'])
 def post_like(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-
+    karma_events = []
     with transaction.atomic():
+        # Same locking scheme as comment_like: the counter read under the row
+        # lock plus our own change is the final count.
+        post = get_object_or_404(
+            Post.objects.select_for_update().only('id', 'author_id', 'like_count'),
+            id=post_id,
+        )
+        like_count = post.like_count
+
         if request.method == 'POST':
-            try:
-                PostLike.objects.create(post=post, user=request.user)
-                KarmaEvent.objects.create(
-                    user=post.author,
-                    actor=request.user,
-                    event_type='post_like',
-                    delta=5,
-                    post=post,
+            _, created = PostLike.objects.get_or_create(post=post, user=request.user)
+            if created:
+                like_count += 1
+                karma_events.append(
+                    KarmaEvent(
+                        user_id=post.author_id,
+                        actor=request.user,
+                        event_type='post_like',
+                        delta=5,
+                        post=post,
+                    )
                 )
-                liked = True
-            except IntegrityError:
-                liked = True
+            liked = True
         else:
             deleted, _ = PostLike.objects.filter(post=post, user=request.user).delete()
             if deleted:
-                KarmaEvent.objects.create(
-                    user=post.author,
-                    actor=request.user,
-                    event_type='post_unlike',
-                    delta=-5,
-                    post=post,
+                like_count -= 1
+                karma_events.append(
+                    KarmaEvent(
+                        user_id=post.author_id,
+                        actor=request.user,
+                        event_type='post_unlike',
+                        delta=-5,
+                        post=post,
+                    )
                 )
             liked = False
 
-    like_count = PostLike.objects.filter(post=post).count()
+        record_karma(karma_events)
+
     return Response({'liked': liked, 'like_count': like_count})
 
 
 @api_view(['POST', 'DELETE'])
 def comment_like(request, comment_id):
-    comment = get_object_or_404(Comment.objects.select_related('author'), id=comment_id)
-
+    karma_events = []
     with transaction.atomic():
+        # Locking the row serializes likes on this comment, so the counter read
+        # here plus our own change is the final count; no COUNT(*) afterwards.
+        comment = get_object_or_404(
+            Comment.objects.select_for_update().only('id', 'author_id', 'like_count'),
+            id=comment_id,
+        )
+        like_count = comment.like_count
+
         if request.method == 'POST':
-            try:
-                CommentLike.objects.create(comment=comment, user=request.user)
-                KarmaEvent.objects.create(
-                    user=comment.author,
-                    actor=request.user,
-                    event_type='comment_like',
-                    delta=1,
-                    comment=comment,
+            _, created = CommentLike.objects.get_or_create(comment=comment, user=request.user)
+            if created:
+                like_count += 1
+                karma_events.append(
+                    KarmaEvent(
+                        user_id=comment.author_id,
+                        actor=request.user,
+                        event_type='comment_like',
+                        delta=1,
+                        comment=comment,
+                    )
                 )
-                liked = True
-            except IntegrityError:
-                liked = True
+            liked = True
         else:
             deleted, _ = CommentLike.objects.filter(comment=comment, user=request.user).delete()
             if deleted:
-                KarmaEvent.objects.create(
-                    user=comment.author,
-                    actor=request.user,
-                    event_type='comment_unlike',
-                    delta=-1,
-                    comment=comment,
+                like_count -= 1
+                karma_events.append(
+                    KarmaEvent(
+                        user_id=comment.author_id,
+                        actor=request.user,
+                        event_type='comment_unlike',
+                        delta=-1,
+                        comment=comment,
+                    )
                 )
             liked = False
 
-    like_count = CommentLike.objects.filter(comment=comment).count()
+        record_karma(karma_events)
+
     return Response({'liked': liked, 'like_count': like_count})
 
 
-@api_view(['GET'])
-def leaderboard(request):
+def _compute_leaderboard():
     since = timezone.now() - timedelta(hours=24)
-    User = get_user_model()
 
+    # Sum the hourly rollup rather than raw events, so the cost doesn't grow with event volume.
     rows = (
-        KarmaEvent.objects.filter(created_at__gte=since)
-        .values('user')
-        .annotate(karma=Coalesce(Sum('delta'), 0))
+        KarmaHourly.objects.filter(hour_bucket__gte=hour_bucket(since))
+        .values('user', 'user__username')
+        .annotate(karma=Coalesce(Sum('delta_sum'), 0))
         .order_by('-karma')[:5]
     )
 
-    users = User.objects.in_bulk([r['user'] for r in rows])
+    return [
+        {
+            'user': {'id': r['user'], 'username': r['user__username']},
+            'karma': r['karma'],
+        }
+        for r in rows
+    ]
 
-    payload = []
-    for r in rows:
-        u = users.get(r['user'])
-        if not u:
-            continue
-        payload.append(
-            {
-                'user': {'id': u.id, 'username': u.username},
-                'karma': r['karma'],
-            }
-        )
 
-    return Response(payload)
+@transaction.non_atomic_requests
+@api_view(['GET'])
+def leaderboard(request):
+    return Response(cache.get_or_set(LEADERBOARD_CACHE_KEY, _compute_leaderboard, LEADERBOARD_CACHE_TTL))
@@ -436,7 +436,10 @@ function App() {
                           <span className="font-semibold">{p.author.username}</span>
                           <span className="ml-2 text-xs text-slate-500">{formatTs(p.created_at)}</span>
                         </div>
-                        <div className="mt-2 text-sm text-slate-800 whitespace-pre-wrap">{p.body}</div>
+                        <div className="mt-2 text-sm text-slate-800 whitespace-pre-wrap">
+                          {p.body_preview}
+                          {p.body_truncated ? '…' : ''}
+                        </div>
                         <div className="mt-2 text-xs text-slate-500">
                           {p.comment_count} comments
                         </div>